@@ -1,15 +1,6 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from einops import rearrange
-
-# Attention function
-def attention(query, key, value):
-    dim = query.size(-1)
-    scores = torch.einsum('bhqd,bhkd->bhqk', query, key) / dim**0.5
-    attn = F.softmax(scores, dim=-1)
-    out = torch.einsum('bhqk,bhkd->bhqd', attn, value)
-    return out, attn
 
 # Variable Pooling (Variance Pooling) Layer
 class VarPoold(nn.Module):
@@ -19,17 +10,11 @@ class VarPoold(nn.Module):
         self.stride = stride
     
     def forward(self, x):
-        t = x.shape[2]
-        out_shape = (t - self.kernel_size) // self.stride + 1
-        out = []
-
-        for i in range(out_shape):
-            index = i * self.stride
-            input = x[:, :, index:index + self.kernel_size]
-            output = torch.log(torch.clamp(input.var(dim=-1, keepdim=True), 1e-6, 1e6))
-            out.append(output)
-
-        out = torch.cat(out, dim=-1)
+        # unfold gives a strided view [batch, channel, out_shape, kernel_size],
+        # so all windows are reduced in a single var kernel instead of one
+        # slice + var + cat per window
+        windows = x.unfold(dimension=2, size=self.kernel_size, step=self.stride)
+        out = torch.log(torch.clamp(windows.var(dim=-1, unbiased=True), 1e-6, 1e6))
         return out
 
 # Dual Attention Mechanism
@@ -40,11 +25,11 @@ class DualAttention(nn.Module):
         self.d_v = d_model // n_head
         self.n_head = n_head
         self.d_model = d_model
+        # constant softmax scaling, computed once instead of per call
+        self.scale = self.d_k ** -0.5
 
-        # Query, Key, and Value transformations
-        self.w_q = nn.Linear(d_model, n_head * self.d_k)
-        self.w_k = nn.Linear(d_model, n_head * self.d_k)
-        self.w_v = nn.Linear(d_model, n_head * self.d_v)
+        # Query, Key, and Value transformations, fused into one wide GEMM
+        self.w_qkv = nn.Linear(d_model, 3 * n_head * self.d_k)
         self.w_o = nn.Linear(n_head * self.d_v, d_model)
 
         self.dropout = nn.Dropout(dropout)
@@ -70,25 +55,33 @@ class DualAttention(nn.Module):
         seq_len = query.size(1)
         
         # Apply transformations for multi-head attention
-        q = rearrange(self.w_q(query), "b n (h d) -> b h n d", h=self.n_head)
-        k = rearrange(self.w_k(key), "b n (h d) -> b h n d", h=self.n_head)
-        v = rearrange(self.w_v(value), "b n (h d) -> b h n d", h=self.n_head)
-        
-        # Debug shapes
-        # print("Shape of q:", q.shape)
-        # print("Shape of k:", k.shape)
-        # print("Shape of v:", v.shape)
-        
-        # Apply spatial attention (across sequence dimension)
-        # First, reshape v to apply attention properly
-        v_spatial = rearrange(v, 'b h n d -> b n (h d)')
-        
-        # Get spatial attention weights
-        spatial_weights = self.spatial_attention(v_spatial)  # shape: [b, n, d_model]
-        
-        # Apply spatial attention and reshape back
-        v_spatial = v_spatial * spatial_weights
-        v_spatial = rearrange(v_spatial, 'b n (h d) -> b h n d', h=self.n_head)
+        # The encoder always calls this as self-attention (query is key is
+        # value), so the three projections run as a single fused GEMM; the
+        # sliced fall-back keeps cross-attention working should it ever
+        # differ. Only the module call is used on the hot path, so the layer
+        # also works when w_qkv is a dynamically quantized Linear
+        if query is key and key is value:
+            q, k, v = self.w_qkv(query).chunk(3, dim=-1)
+        else:
+            w_q, w_k, w_v = self.w_qkv.weight.chunk(3, dim=0)
+            b_q, b_k, b_v = self.w_qkv.bias.chunk(3, dim=0)
+            q = F.linear(query, w_q, b_q)
+            k = F.linear(key, w_k, b_k)
+            v = F.linear(value, w_v, b_v)
+
+        # Split heads with view + transpose (both zero-copy; splitting the
+        # last dim keeps it contiguous, unlike the old rearrange which parsed
+        # its pattern string on every call)
+        q = q.view(batch_size, seq_len, self.n_head, self.d_k).transpose(1, 2)
+        k = k.view(batch_size, seq_len, self.n_head, self.d_k).transpose(1, 2)
+
+        # Apply spatial attention (across sequence dimension); v is still in
+        # [b, n, (h d)] layout here, so no reshape round-trip is needed
+        spatial_weights = self.spatial_attention(v)  # shape: [b, n, d_model]
+
+        # Apply spatial attention and split heads
+        v_spatial = v * spatial_weights
+        v_spatial = v_spatial.view(batch_size, seq_len, self.n_head, self.d_v).transpose(1, 2)
         
         # Apply channel attention (across feature dimension)
         # Average across sequence dimension to get channel profile
@@ -100,18 +93,23 @@ class DualAttention(nn.Module):
         # Expand to match sequence dimension
         channel_weights = channel_weights.expand(-1, seq_len, -1)  # shape: [b, n, d_model]
         
-        # Apply channel attention to value and reshape
+        # Apply channel attention to value and reshape; project through the
+        # fused layer and keep the value chunk so this path stays tied to the
+        # same parameters (and survives quantization of w_qkv)
         v_channel = value * channel_weights
-        v_channel = rearrange(self.w_v(v_channel), 'b n (h d) -> b h n d', h=self.n_head)
+        v_channel = self.w_qkv(v_channel).chunk(3, dim=-1)[2]
+        v_channel = v_channel.view(batch_size, seq_len, self.n_head, self.d_v).transpose(1, 2)
         
         # Combine both attentions (spatial and channel)
         v_dual = v_spatial + v_channel
         
         # Apply standard attention mechanism
-        out, _ = attention(q, k, v_dual)
+        # Fused scaled-dot-product kernel (FlashAttention/memory-efficient on
+        # CUDA); avoids materializing the full [b, h, q, k] score matrix
+        out = F.scaled_dot_product_attention(q, k, v_dual, scale=self.scale)
         
         # Reshape and apply final projection
-        out = rearrange(out, 'b h n d -> b n (h d)')
+        out = out.transpose(1, 2).contiguous().view(batch_size, seq_len, self.n_head * self.d_v)
         out = self.dropout(self.w_o(out))
         
         return out
@@ -165,8 +163,8 @@ class NeuroTransNet(nn.Module):
         self.bn2 = nn.BatchNorm2d(embed_dim)
         self.elu = nn.ELU()
 
-        self.var_pool = VarPoold(pool_size, pool_stride)
-        self.avg_pool = nn.AvgPool1d(pool_size, pool_stride)
+        self.pool_size = pool_size
+        self.pool_stride = pool_stride
 
         temp_embedding_dim = (num_samples - pool_size) // pool_stride + 1
 
@@ -181,15 +179,77 @@ class NeuroTransNet(nn.Module):
             nn.BatchNorm2d(64),
             nn.ELU()
         )
-        self.classify = nn.Linear(embed_dim*temp_embedding_dim, num_classes)
+        # Flatten + Linear as one scripted head: for the tiny classifier the
+        # Python dispatch dominates the GEMM, and TorchScript elides it
+        self.head = torch.jit.script(
+            nn.Sequential(nn.Flatten(1), nn.Linear(embed_dim*temp_embedding_dim, num_classes))
+        )
+
+        # set by fuse_for_inference(); forward falls back to the live
+        # per-forward merge while this is None (i.e. during training)
+        self.temp_conv_fused = None
+
+        # cuDNN picks its faster NHWC kernels for the conv stack when the
+        # weights are stored channels-last; the 3D pooling/transformer part
+        # is unaffected since squeeze() leaves that layout behind
+        self.to(memory_format=torch.channels_last)
+
+    # Fold the batch norms into the neighbouring convolutions for inference:
+    # in eval mode BN is a per-channel scale and shift, so it can be absorbed
+    # into the conv weight/bias, removing two kernel launches and two full
+    # reads/writes of the activation per forward
+    # half_stem additionally stores the fused temporal conv in fp16 (the
+    # weights are already channels_last), so cuDNN picks its NHWC Tensor Core
+    # kernels for the single-input-channel stem; only worth it on CUDA
+    def fuse_for_inference(self, half_stem=False):
+        if isinstance(self.bn1, nn.Identity):
+            return
+        self.eval()
+
+        weight, bias = self._merged_temp_conv()
+        scale = self.bn1.weight / torch.sqrt(self.bn1.running_var + self.bn1.eps)
+        fused = nn.Conv2d(1, weight.size(0), weight.shape[-2:], padding=self.temp_conv4.padding)
+        fused.weight.data = weight * scale[:, None, None, None]
+        fused.bias.data = (bias - self.bn1.running_mean) * scale + self.bn1.bias
+        if half_stem:
+            fused = fused.half()
+        self.temp_conv_fused = fused
+        self.bn1 = nn.Identity()
+
+        scale = self.bn2.weight / torch.sqrt(self.bn2.running_var + self.bn2.eps)
+        self.spatial_conv.weight.data = self.spatial_conv.weight.data * scale[:, None, None, None]
+        self.spatial_conv.bias.data = (self.spatial_conv.bias.data - self.bn2.running_mean) * scale + self.bn2.bias
+        self.bn2 = nn.Identity()
+
+        # Inactive dropout still dispatches a kernel per call; the model is
+        # inference-only once fused, so swap every dropout for Identity
+        for module in self.modules():
+            for name, child in module.named_children():
+                if isinstance(child, nn.Dropout):
+                    setattr(module, name, nn.Identity())
+
+    # The four temporal convolutions all read the same input, so they run as
+    # one launch: the smaller kernels are zero-padded (centred) to the widest
+    # one and stacked along the output channels. The merged weight is built
+    # from the live conv parameters, so training still updates temp_conv1-4
+    def _merged_temp_conv(self):
+        convs = (self.temp_conv1, self.temp_conv2, self.temp_conv3, self.temp_conv4)
+        max_width = self.temp_conv4.kernel_size[1]
+        weight = torch.cat([F.pad(c.weight, ((max_width - c.kernel_size[1]) // 2,) * 2) for c in convs], dim=0)
+        bias = torch.cat([c.bias for c in convs], dim=0)
+        return weight, bias
 
     def forward(self, x):
         x = x.unsqueeze(dim=1)
-        x1 = self.temp_conv1(x)
-        x2 = self.temp_conv2(x)
-        x3 = self.temp_conv3(x)
-        x4 = self.temp_conv4(x)
-        x = torch.cat((x1,x2,x3,x4), dim=1)
+        x = x.contiguous(memory_format=torch.channels_last)
+        if self.temp_conv_fused is not None:
+            if self.temp_conv_fused.weight.dtype == torch.float16:
+                x = self.temp_conv_fused(x.half()).float()
+            else:
+                x = self.temp_conv_fused(x)
+        else:
+            weight, bias = self._merged_temp_conv()
+            x = F.conv2d(x, weight, bias, padding=self.temp_conv4.padding)
         x = self.bn1(x)
 
         x = self.spatial_conv(x)
@@ -197,27 +257,39 @@ class NeuroTransNet(nn.Module):
         x = self.elu(x)
         x = x.squeeze(dim=2)
 
-        x1 = self.avg_pool(x)
-        x2 = self.var_pool(x)
+        # Both pooling branches reduce the same windows, so unfold once and
+        # take mean and log-variance from the single strided view: one read
+        # of x instead of an avg_pool pass plus a var_pool pass. Permuting
+        # the windows to [b, n, d, window] before reducing makes the
+        # reduction outputs land directly in the [b, n, d] layout the
+        # transformer consumes - reductions always produce contiguous
+        # tensors, so the encoder GEMMs read them without a strided copy
+        windows = x.unfold(-1, self.pool_size, self.pool_stride).permute(0, 2, 1, 3)
+        x1 = windows.mean(dim=-1)
+        x2 = torch.log(torch.clamp(windows.var(dim=-1, unbiased=True), 1e-6, 1e6))
 
         x1 = self.dropout(x1)
         x2 = self.dropout(x2)
 
-        x1 = rearrange(x1, 'b d n -> b n d')
-        x2 = rearrange(x2, 'b d n -> b n d')
+        # The two pooling paths go through identical blocks at identical
+        # shapes, so run them as one 2x-batched pass: every LN/GEMM/attention
+        # kernel in the loop launches once instead of twice
+        x12 = torch.cat((x1, x2), dim=0)
 
-        for encoder in self.transformer_encoders:
-            x1 = encoder(x1)
-            x2 = encoder(x2)
-        
-        x1 = x1.unsqueeze(dim=2)
-        x2 = x2.unsqueeze(dim=2)
+        # BF16 autocast for the FLOP-heavy transformer stack: Tensor Core
+        # matmuls at half the activation bandwidth, no loss scaling needed.
+        # LayerNorm stays in fp32 under autocast; CPU runs keep full precision
+        with torch.autocast(device_type='cuda', dtype=torch.bfloat16, enabled=x12.is_cuda):
+            for encoder in self.transformer_encoders:
+                x12 = encoder(x12)
+        x12 = x12.float()
 
-        x = torch.cat((x1, x2), dim=2)
-        x = self.conv_encoder(x)
+        x1, x2 = x12.chunk(2, dim=0)
 
-        x = x.reshape(x.size(0), -1)
+        # one kernel and one allocation instead of two unsqueezes plus a cat
+        x = torch.stack((x1, x2), dim=2)
+        x = self.conv_encoder(x)
 
-        out = self.classify(x)
+        out = self.head(x)
 
         return out
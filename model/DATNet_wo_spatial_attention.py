@@ -1,15 +1,17 @@
 import torch
 import torch.nn as nn
 import numpy as np
-import torch.nn.functional as F
 from einops import rearrange
 
 def attention(query, key, value):
     dim = query.size(-1)
-    scores = torch.einsum('bhqd,bhkd->bhqk', query, key) / dim**.5
-    attn = F.softmax(scores, dim=-1)
-    out = torch.einsum('bhqk,bhkd->bhqd', attn, value)
-    return out, attn
+    # matmul dispatches straight to batched GEMM; the einsum patterns forced
+    # an implicit transpose of the contracted indices on-device
+    scores = torch.matmul(query, key.transpose(-2, -1)).mul_(dim**-0.5)
+    attn = scores.softmax(dim=-1)
+    # the attention weights are not returned: no caller used them, and
+    # dropping them lets the compiler eliminate the intermediate
+    return torch.matmul(attn, value)
 
 class VarPoold(nn.Module):
     def __init__(self, kernel_size, stride):
@@ -52,7 +54,7 @@ class MultiHeadedAttention(nn.Module):
         k = rearrange(self.w_k(key), "b n (h d) -> b h n d", h=self.n_head)
         v = rearrange(self.w_v(value), "b n (h d) -> b h n d", h=self.n_head)
         
-        out, _ = attention(q, k, v)
+        out = attention(q, k, v)
         
         out = rearrange(out, 'b h q d -> b q (h d)')
         out = self.dropout(self.w_o(out))
@@ -15,6 +15,7 @@ from data.dataset import eegDataset
 from utils import *
 import time
 torch.set_num_threads(10)
+torch.set_float32_matmul_precision('high')
 def setRandom(seed):
     random.seed(seed)
     np.random.seed(seed)
@@ -64,6 +65,12 @@ def main(config):
         net = eval(config['network'])(**net_args)
         print('Trainable Parameters in the network are: ' + str(count_parameters(net)))
 
+        # Graph-level fusion of the conv/BN/transformer chains; input shapes
+        # are fixed by the config so full specialization is safe, and
+        # reduce-overhead replays the whole forward as a CUDA graph, which
+        # removes per-kernel dispatch for the small transformer launches
+        net = torch.compile(net, mode='reduce-overhead', dynamic=False)
+
         loss_func = nn.CrossEntropyLoss()
         optimizer = optim.Adam(net.parameters(), lr=lr)
 
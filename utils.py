@@ -10,6 +10,15 @@ from matplotlib import pyplot as plt
 def count_parameters(model):
     return sum(p.numel() for p in model.parameters() if p.requires_grad)
 
+def quantize_for_inference(model):
+    """ Post-training dynamic quantization for CPU inference: every nn.Linear
+        (the QKV/FFN projections dominating the transformer stack) switches to
+        int8 weights with on-the-fly activation quantization. Roughly doubles
+        small-GEMM throughput on VNNI-capable CPUs and halves weight memory;
+        convolutions stay in float since dynamic quantization only covers
+        Linear/LSTM. Call on a trained model after eval()/fuse_for_inference(). """
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
 class ActivationsAndGradients:
     """ Class for extracting activations and
     registering gradients from targeted intermediate layers """